@@ -4,10 +4,27 @@
 
 from flask import Flask, request, jsonify
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import random
+import time
 from typing import Dict, Any
 
+# orjson é opcional: serialização e parse JSON em C para o payload e a
+# resposta da IA, com fallback para o json do stdlib (mesmo padrão do app
+# Streamlit).
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+# Sessão com pool de conexões: mantém a conexão TLS com a OpenRouter viva
+# entre chamadas (keep-alive), em vez de pagar um handshake por requisição.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
 # Módulo 4: Simulação de Integrações - Chave de API vinculada
 # ATENÇÃO: Em produção, carregue a chave de uma variável de ambiente (ex: os.environ['OPENROUTER_API_KEY']).
 OPENROUTER_API_KEY = "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"
@@ -16,6 +33,13 @@ MODEL_NAME = "tngtech/deepseek-r1t2-chimera:free"
 
 app = Flask(__name__)
 
+# Cache em memória dos mapeamentos já detectados, chaveado por
+# (colunas, linha de amostra): detecções repetidas da mesma planilha não
+# voltam à OpenRouter. Limitado a _DETECTION_CACHE_MAX entradas (descarta a
+# mais antiga) para não crescer sem teto num processo de longa duração.
+_DETECTION_CACHE: Dict[Any, Dict[str, Any]] = {}
+_DETECTION_CACHE_MAX = 256
+
 # Configuração para permitir requisições CORS do frontend.
 # Em um ambiente de produção real, use um domínio específico em vez de "*".
 @app.after_request
@@ -25,8 +49,23 @@ def add_cors_headers(response):
     response.headers.add('Access-Control-Allow-Methods', 'POST')
     return response
 
+# Número de novas tentativas para erros transitórios (429/5xx/conexão)
+_MAX_RETRIES = 3
+
+# Teto (em segundos) para qualquer espera — backoff ou cooldown de 429. O
+# Retry-After vem de fora e já chegou com valores de horas; dormir isso
+# dentro do handler Flask travaria todas as requisições seguintes.
+_MAX_BACKOFF = 30
+
+# Momento (time.time) até o qual novas chamadas devem aguardar, definido
+# quando a OpenRouter responde 429 com Retry-After: evita que chamadas
+# subsequentes tropecem no mesmo limite de taxa.
+_openrouter_cooldown_until = 0.0
+
 def _call_openrouter_api(ai_prompt: str, api_key: str) -> Dict[str, Any]:
     """Função interna para chamar a API OpenRouter."""
+    global _openrouter_cooldown_until
+
     payload = {
         "model": MODEL_NAME,
         "messages": [
@@ -44,19 +83,62 @@ def _call_openrouter_api(ai_prompt: str, api_key: str) -> Dict[str, Any]:
         "X-Title": "Python Flask Backend", 
     }
 
-    try:
-        response = requests.post(
-            url=API_URL,
-            headers=headers,
-            json=payload,
-            timeout=30 
-        )
-        response.raise_for_status() 
-        return response.json()
-
-    except requests.exceptions.RequestException as err:
-        app.logger.error(f"Erro ao chamar OpenRouter API: {err}")
-        return {"error": "Falha na comunicação com a IA."}
+    # Serializa o payload uma única vez, fora do laço de retentativas: o
+    # corpo não muda entre tentativas (o Content-Type já está nos headers)
+    body = orjson.dumps(payload) if _HAS_ORJSON else json.dumps(payload)
+
+    for attempt in range(_MAX_RETRIES + 1):
+        # Guarda preventiva: se um 429 recente definiu um cooldown, espera o
+        # restante antes de emitir a chamada
+        wait = min(_openrouter_cooldown_until - time.time(), _MAX_BACKOFF)
+        if wait > 0:
+            time.sleep(wait)
+
+        try:
+            response = _SESSION.post(
+                url=API_URL,
+                headers=headers,
+                data=body,
+                timeout=30
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                if response.status_code == 429:
+                    # Retry-After pode ser uma data HTTP em vez de segundos:
+                    # parse defensivo, como no remetente assíncrono do app
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', 0) or 0)
+                    except ValueError:
+                        retry_after = 0.0
+                    if retry_after > 0:
+                        # Cooldown limitado ao mesmo teto do backoff: o valor
+                        # é global e um Retry-After gigante não pode parar o
+                        # servidor inteiro
+                        _openrouter_cooldown_until = time.time() + min(retry_after, _MAX_BACKOFF)
+                if attempt < _MAX_RETRIES:
+                    # Backoff exponencial com jitter uniforme: decorrelaciona
+                    # tentativas simultâneas (evita que todas voltem juntas e
+                    # tropecem de novo no limite de taxa)
+                    time.sleep(min(2 ** attempt + random.uniform(0, 1), _MAX_BACKOFF))
+                    continue
+            # Ramo explícito por status em vez de raise_for_status(): os 4xx
+            # restantes são definitivos (ex.: chave inválida) e o corpo é lido
+            # uma única vez, sem reparse no tratamento da exceção
+            if response.status_code >= 400:
+                app.logger.error(
+                    f"Erro ao chamar OpenRouter API: HTTP {response.status_code}: {response.text[:200]}"
+                )
+                return {"error": "Falha na comunicação com a IA."}
+            return response.json()
+
+        except requests.exceptions.RequestException as err:
+            # Só erros de transporte (timeout, DNS, conexão) chegam aqui
+            if attempt < _MAX_RETRIES:
+                time.sleep(min(2 ** attempt + random.uniform(0, 1), _MAX_BACKOFF))
+                continue
+            app.logger.error(f"Erro ao chamar OpenRouter API: {err}")
+            return {"error": "Falha na comunicação com a IA."}
+
+    return {"error": "Falha na comunicação com a IA."}
 
 @app.route('/api/detect-columns', methods=['POST'])
 def detect_columns_endpoint():
@@ -82,6 +164,14 @@ def detect_columns_endpoint():
     # Ex: {"Nome": "Alice", "Telefone": 5511} -> "Alice, 5511, ..."
     matriz_unidimensional_texto = ', '.join(map(str, sample_row.values()))
 
+    # Cache por planilha: o frontend reenvia a mesma detecção a cada
+    # recarregamento, e colunas + amostra idênticas produzem o mesmo
+    # mapeamento — não há por que repetir a chamada (30s de timeout) à IA.
+    cache_key = (tuple(headers), matriz_unidimensional_texto)
+    cached = _DETECTION_CACHE.get(cache_key)
+    if cached is not None:
+        return jsonify(cached), 200
+
     # Módulo 40: Deployment Wrapper - Prompt Estruturado
     ai_prompt = f"""
 # DEEP SYSTEM PROMPT: ANALISTA DE DADOS E MAPEAMENTO
@@ -117,8 +207,19 @@ Retorne APENAS o JSON conforme instruído no Deep System Prompt.
         ai_response_text = api_result['choices'][0]['message']['content'].strip()
         # Limpa e tenta parsear a string JSON da IA
         clean_json_text = ai_response_text.replace('```json', '').replace('```', '').strip()
-        final_result = json.loads(clean_json_text)
-        
+        final_result = orjson.loads(clean_json_text) if _HAS_ORJSON else json.loads(clean_json_text)
+
+        # Só entra no cache o mapeamento que aponta para colunas reais da
+        # planilha: uma resposta malformada da IA não deve ficar retida
+        if (
+            isinstance(final_result, dict)
+            and final_result.get('name_key') in headers
+            and final_result.get('number_key') in headers
+        ):
+            if len(_DETECTION_CACHE) >= _DETECTION_CACHE_MAX:
+                _DETECTION_CACHE.pop(next(iter(_DETECTION_CACHE)))
+            _DETECTION_CACHE[cache_key] = final_result
+
         # Módulo 26: Retorna a resposta JSON limpa para o frontend
         return jsonify(final_result), 200
 
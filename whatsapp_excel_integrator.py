@@ -1,600 +1,1273 @@
-import streamlit as st
-import pandas as pd
-import requests
-import re
-import json
-import time
-from io import BytesIO
-from typing import Optional, Dict, Any, Tuple
-
-# --- CONSTANTES DE MAPEAMENTO FIXO (REMOVIDAS, AGORA SÓ HINTS) ---
-# Nenhuma chave ou constante de AI é necessária, pois o mapeamento é fixo.
-# ----------------------------------------------------
-
-
-# --- I. FUNÇÕES CRÍTICAS DE PROCESSAMENTO (Simplificadas) ---
-
-def clean_and_standardize_phone(number: str, default_country_code: str) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Limpa o número de telefone, removendo caracteres não-dígitos e
-    garantindo o formato E.164 (código do país + DDD + Número).
-    
-    Retorna uma tupla (numero_padronizado, motivo_falha).
-    """
-    if not number:
-        return None, "Número de entrada vazio ou nulo."
-    
-    # Assume que o CC é os 2 primeiros dígitos e o DD é o restante da string de configuração
-    CC = default_country_code[:2] if len(default_country_code) >= 2 else "55" 
-    DD = default_country_code[2:4] if len(default_country_code) >= 4 else "31"
-    
-    # --- NOVIDADE: Pré-validação do formato visual do hífen (Corrigido) ---
-    raw_number_str = str(number)
-    if '-' in raw_number_str:
-        parts = raw_number_str.split('-')
-        
-        # Deve ter exatamente um hífen
-        if len(parts) != 2:
-             return None, "Formato do hífen inválido. Deve ter exatamente um hífen."
-        
-        # Remove caracteres não-dígitos das partes para contagem
-        part2_clean = re.sub(r'\D', '', parts[1])
-
-        # Se a parte 2 não tiver 4 dígitos, falha conforme regra do usuário.
-        # Esta é a validação rigorosa para rejeitar números como XXXX-147 (3 dígitos).
-        if len(part2_clean) != 4:
-            return None, f"A segunda parte do número (após o hífen) deve conter exatamente 4 dígitos. Encontrado: {len(part2_clean)} dígitos."
-            
-    
-    # 1. Converte para string e remove todos os caracteres não-dígitos
-    cleaned_number = re.sub(r'\D', '', str(number))
-    phone_length = len(cleaned_number)
-
-    # ----------------------------------------------------------------------
-    # LÓGICA AVANÇADA DE PADRONIZAÇÃO (Baseado em 55 e 31)
-    # ----------------------------------------------------------------------
-    
-    # Verifica se o número já tem o CC (Ex: 55)
-    has_cc = cleaned_number.startswith(CC)
-    
-    # Tratamento de números de 12 dígitos que são 55 + DD + 8 dígitos (faltando o '9')
-    if phone_length == 12 and has_cc:
-        # Padrão: 55 + DD + 8 dígitos. (Ex: 553187654321)
-        inferred_number = cleaned_number[:4] + '9' + cleaned_number[4:]
-        return inferred_number, None
-        
-    # Número com exatamente 10 dígitos (DD + 8 dígitos, assumindo falta de 55 e '9')
-    if phone_length == 10:
-        # O número é DD + 8 dígitos (ex: 3187654321).
-        inferred_number = CC + cleaned_number[:2] + '9' + cleaned_number[2:]
-        return inferred_number, None 
-
-    # Caso 1: Número Local (8 ou 9 dígitos). Faltam CC e DD.
-    if phone_length in [8, 9]:
-        return CC + DD + cleaned_number, None
-
-    # Caso 2: Número com DDD (11 dígitos). Falta o CC.
-    if phone_length == 11:
-        if cleaned_number.startswith(DD):
-            return CC + cleaned_number, None
-        else:
-            return CC + cleaned_number, None
-
-    # Caso 3: Número Internacional Completo (13 dígitos).
-    if phone_length == 13:
-        if has_cc:
-            return cleaned_number, None
-        
-    # Caso 4: Outros tamanhos (Muito longo ou muito curto/Inválido)
-    if phone_length < 8:
-        return None, f"Número muito curto ({phone_length} dígitos)."
-    if phone_length > 13 and not has_cc:
-        return None, f"Número muito longo sem Código de País ({phone_length} dígitos)."
-
-    # Se nenhuma regra de padronização se aplicou ou se o número é inválido
-    return None, f"Tamanho inválido ou não padronizável ({phone_length} dígitos)."
-
-def format_phone_for_vcf(e164_number: str) -> str:
-    """
-    Formata um número E.164 (ex: 5531987654321) para o formato visual solicitado: 
-    +CC (DD) 9XXXX-XXXX
-    """
-    if not e164_number or len(e164_number) != 13:
-        return e164_number 
-        
-    # Exemplo: 55 31 9 8765 4321
-    cc = e164_number[0:2] 
-    ddd = e164_number[2:4] 
-    part1 = e164_number[4:9] 
-    part2 = e164_number[9:13] 
-    
-    # Formato: +55 (31) 98765-4321
-    return f"+{cc} ({ddd}) {part1}-{part2}"
-
-# --- PATH A: VCF (vCard) GENERATION ---
-
-def generate_vcf_content(df: pd.DataFrame, responsible_name_col: str, student_name_col: str, phone_col: str, turma_name_col: str, default_country_code: str, failed_contacts: list, successful_contacts: list) -> str:
-    """
-    Gera o conteúdo de um único arquivo VCF (vCard) a partir do DataFrame.
-    Preenche as listas `failed_contacts` e `successful_contacts`.
-    """
-    vcf_blocks = []
-    
-    for index, row in df.iterrows():
-        # Mapeamento dinâmico: as variáveis de coluna agora contêm o nome escolhido pelo usuário.
-        responsible_name = str(row.get(responsible_name_col, '')).strip()
-        student_name = str(row.get(student_name_col, '')).strip()
-        turma_name = str(row.get(turma_name_col, '')).strip() 
-        original_phone = str(row.get(phone_col, '')).strip()
-        
-        # Monta o nome completo do contato (Responsável + Aluno) para o VCF
-        full_name_for_vcf = f"{responsible_name} - {student_name}" if student_name else responsible_name
-        
-        # Limpeza do número
-        cleaned_phone_e164, failure_reason = clean_and_standardize_phone(original_phone, default_country_code)
-        
-        if responsible_name and cleaned_phone_e164:
-            # Formata o número SOMENTE para o bloco VCF para visualização
-            formatted_phone = format_phone_for_vcf(cleaned_phone_e164)
-            
-            # Bloco VCF usa o nome composto
-            vcf_block = f"""BEGIN:VCARD
-VERSION:3.0
-FN:{full_name_for_vcf}
-N:;{responsible_name};;;
-TEL;TYPE=CELL:{formatted_phone}
-END:VCARD"""
-            vcf_blocks.append(vcf_block)
-            
-            # Adiciona à lista de sucesso para visualização
-            successful_contacts.append({
-                "Índice_Linha_Original": index + 1,
-                "Nome do Responsável": responsible_name, 
-                "Nome do Aluno": student_name, 
-                "Nome da Turma": turma_name, 
-                "Número Original": original_phone,
-                "Número Padronizado (E.164)": cleaned_phone_e164, 
-                "Visualização VCF": formatted_phone 
-            })
-            
-        else:
-            # Adiciona os metadados do erro à linha completa do DataFrame
-            failed_entry = {
-                "Índice_Linha_Original": index + 1,
-                "Nome do Responsável": responsible_name, 
-                "Nome do Aluno": student_name, 
-                "Nome da Turma": turma_name, 
-                "Telefone": original_phone, 
-                "Motivo_da_Falha": failure_reason or "Nome ou Número Limpo Inválido.",
-                "Explicação_Manual": "O número não pôde ser padronizado. Verifique se ele contém o DDD e o 9º dígito se for celular."
-            }
-            # Combina os metadados com todos os dados da linha original
-            failed_contacts.append(failed_entry | row.to_dict()) 
-            
-    return '\n'.join(vcf_blocks)
-
-# --- PATH B: WHATSAPP CLOUD API INTEGRATION ---
-
-def send_whatsapp_template_message(
-    phone_number_id: str, 
-    access_token: str, 
-    recipient_number: str, 
-    template_name: str, 
-    contact_name: str
-) -> Dict[str, Any]:
-    """Envia uma mensagem de template via WhatsApp Cloud API."""
-    
-    # 1. Constrói o URL da API
-    url = f"[https://graph.facebook.com/v19.0/](https://graph.facebook.com/v19.0/){phone_number_id}/messages"
-    
-    # 2. Constrói o payload da mensagem (assumindo o placeholder {{1}} para o nome)
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": recipient_number,
-        "type": "template",
-        "template": {
-            "name": template_name,
-            "language": {
-                "code": "pt_BR"
-            },
-            "components": [
-                {
-                    "type": "body",
-                    "parameters": [
-                        {
-                            # Substitui o placeholder {{1}} pelo nome do contato
-                            "type": "text",
-                            "text": contact_name 
-                        }
-                    ]
-                }
-            ]
-        }
-    }
-    
-    # 3. Define os cabeçalhos de autenticação
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status() 
-        return {"status": "Success", "data": response.json()}
-    except requests.exceptions.HTTPError as e:
-        # Erros da API (ex: token inválido, template não encontrado)
-        error_detail = e.response.json().get('error', {}).get('message', 'Erro HTTP desconhecido.')
-        return {"status": "Failure", "detail": f"HTTP Error: {e.response.status_code}. Detalhe: {error_detail}"}
-    except requests.exceptions.RequestException as e:
-        # Erros de conexão (ex: timeout, DNS)
-        return {"status": "Failure", "detail": f"Erro de Conexão: {e}"}
-
-# --- II. ESTRUTURA E INTERFACE DO STREAMLIT ---
-
-# Função auxiliar para sugerir a coluna inicial (se houver correspondência)
-def find_initial_column(columns, hint):
-    """Tenta encontrar uma coluna que corresponda ao hint ('Turma', 'Aluno', etc.) para pre-seleção."""
-    # Prioriza correspondência exata, depois correspondência sem espaços (normalizada)
-    if hint in columns:
-        return hint
-    
-    normalized_hint = hint.strip().lower()
-    for col in columns:
-        if col.strip().lower() == normalized_hint:
-             return col
-    # Se não encontrar, retorna a primeira coluna como fallback
-    return columns[0] if columns else None
-
-
-def main():
-    # Remove a interface do chat AI
-    
-    st.set_page_config(
-        page_title="Excel-to-WhatsApp Sender",
-        layout="wide",
-        initial_sidebar_state="collapsed" 
-    )
-    
-    st.title("🚀 Conversor Excel/CSV para Contatos/WhatsApp (Mapeamento Manual)")
-    st.markdown("Automatize a integração de contatos da sua planilha para o celular (VCF) ou para o WhatsApp Business Cloud API.")
-    st.markdown("---")
-
-    # --- Step 1: Upload & Map ---
-    
-    st.header("1. Upload e Mapeamento de Dados")
-    
-    uploaded_file = st.file_uploader("Selecione seu arquivo (.xlsx, .xls ou .csv)", type=["xlsx", "xls", "csv"])
-
-    if uploaded_file is not None:
-        try:
-            # Carrega o DataFrame
-            if uploaded_file.name.endswith('.csv'):
-                # Tenta ler CSV com detecção automática de delimitador/encoding
-                df = pd.read_csv(uploaded_file, encoding='utf-8', sep=None, engine='python')
-            else:
-                # Usa BytesIO para garantir a compatibilidade com Streamlit e pandas
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
-            
-            # Normaliza os nomes das colunas (remove espaços em branco)
-            # Isso garante que a exibição e a seleção sejam limpas, mas as chaves do DataFrame permanecem as originais.
-            df.columns = df.columns.str.strip() 
-            
-            st.session_state['df'] = df
-            columns = df.columns.tolist()
-            
-            if not columns:
-                st.error("❌ O arquivo parece estar vazio ou sem cabeçalhos.")
-                return
-
-            st.success(f"Arquivo '{uploaded_file.name}' carregado com sucesso. {len(df)} linhas encontradas.")
-            
-            # --- NOVO: Seleção Manual de Colunas ---
-            st.subheader("Selecione as Colunas Correspondentes:")
-
-            # Cria a lista de opções, adicionando uma opção vazia se a lista não estiver vazia
-            column_options = columns
-
-            # Mapeamento dos campos necessários e seus hints para pre-seleção
-            fields_to_map = {
-                "responsible_name_col": "Responsável",
-                "student_name_col": "Aluno",
-                "turma_name_col": "Turma",
-                "phone_col": "Telefone",
-            }
-            
-            mapped_cols = {}
-            cols = st.columns(2)
-            
-            # Cria os selectboxes
-            for i, (key, hint) in enumerate(fields_to_map.items()):
-                # Tenta encontrar um valor inicial sugerido
-                default_selection = find_initial_column(columns, hint)
-                
-                # Se encontrou um valor, usa-o como índice padrão
-                default_index = column_options.index(default_selection) if default_selection else 0
-                
-                with cols[i % 2]:
-                    # st.selectbox para seleção manual
-                    mapped_cols[key] = st.selectbox(
-                        f"Campo: **{hint}**",
-                        options=column_options,
-                        index=default_index,
-                        key=f'col_select_{key}',
-                        help=f"Selecione a coluna da sua planilha que representa o campo '{hint}'."
-                    )
-
-            # Armazenamento das colunas escolhidas
-            responsible_name_col = mapped_cols['responsible_name_col']
-            student_name_col = mapped_cols['student_name_col']
-            phone_col = mapped_cols['phone_col']
-            turma_name_col = mapped_cols['turma_name_col']
-            
-            # Validação: Garante que o usuário selecionou colunas válidas
-            if not all([responsible_name_col, student_name_col, phone_col, turma_name_col]):
-                st.warning("⚠️ Por favor, selecione uma coluna válida para cada campo.")
-                return
-
-            st.success("✅ Mapeamento de colunas concluído com sucesso!")
-
-            # =========================================================================
-            # Armazenamento e Exibição das Colunas
-            # =========================================================================
-            
-            st.subheader("Colunas Selecionadas:")
-            col_info1, col_info2 = st.columns(2)
-            with col_info1:
-                st.markdown(f"**Responsável:** `{responsible_name_col}`")
-                st.markdown(f"**Aluno:** `{student_name_col}`")
-            with col_info2:
-                st.markdown(f"**Turma:** `{turma_name_col}`")
-                st.markdown(f"**Telefone:** `{phone_col}`")
-
-            
-            # Armazenamento das colunas na session_state
-            st.session_state['responsible_name_col'] = responsible_name_col
-            st.session_state['student_name_col'] = student_name_col
-            st.session_state['phone_col'] = phone_col
-            st.session_state['turma_name_col'] = turma_name_col 
-            # =========================================================================
-            
-            # Coluna para DDD/CC (mantida como input para flexibilidade do usuário)
-            cc_col, ddd_col = st.columns([1, 2])
-            with ddd_col:
-                default_cc_ddd = st.text_input(
-                    "Código de País e DDD Padrão (Ex: 5531):", 
-                    value="5531",
-                    help="Código de País (Ex: 55) + DDD (Ex: 31). Essencial para padronizar números locais."
-                )
-            
-            st.session_state['default_cc'] = re.sub(r'\D', '', default_cc_ddd) # Limpa e armazena
-            
-            st.markdown("---")
-
-            # --- Step 2: Choose Path & Execute ---
-            st.header("2. Escolha o Caminho de Integração")
-            path = st.radio(
-                "Selecione sua necessidade:",
-                ('PATH A: Geração de VCF (Agenda Pessoal)', 'PATH B: Integração WhatsApp Cloud API (Empresarial)'),
-                index=0, key='path_select'
-            )
-
-            if path == 'PATH A: Geração de VCF (Agenda Pessoal)':
-                # --- PATH A: VCF EXECUTION ---
-                st.subheader("Geração de VCF (vCard)")
-                st.markdown("Gera um único arquivo `.vcf` pronto para importação em qualquer agenda de contatos (Google/iOS).")
-                
-                if st.button("📥 Gerar e Baixar Arquivo VCF", key="btn_vcf_gen"):
-                    
-                    # Listas para armazenar os contatos (Módulo 26)
-                    failed_contacts = []
-                    successful_contacts = [] 
-                    
-                    with st.spinner('Processando e limpando dados para VCF...'):
-                        vcf_content = generate_vcf_content(
-                            df, 
-                            st.session_state['responsible_name_col'], 
-                            st.session_state['student_name_col'],     
-                            st.session_state['phone_col'], 
-                            st.session_state['turma_name_col'], 
-                            st.session_state['default_cc'],
-                            failed_contacts, 
-                            successful_contacts 
-                        )
-                    
-                    # Calcula o total de blocos VCF gerados
-                    valid_count = len(vcf_content.split('END:VCARD')) - 1
-                    
-                    # Resposta para o usuário
-                    if valid_count > 0:
-                        st.download_button(
-                            label="✅ Clique para Baixar o VCF",
-                            data=vcf_content.encode('utf-8'),
-                            file_name=f"contatos_import_{int(time.time())}.vcf",
-                            mime="text/vcard"
-                        )
-                        st.success(f"VCF gerado com sucesso! Total de **{valid_count}** contatos válidos.")
-                    else:
-                        st.error("Nenhum contato válido foi encontrado após a limpeza dos números. Verifique o Código de País e DDD.")
-
-                    # --- NOVO REQUISITO: Relatório de Falhas e Sucessos ---
-                    st.markdown("---")
-                    # Módulo 26: Usando o título solicitado pelo usuário
-                    st.header("3. Visualização e Validação dos Números") 
-                    
-                    # 1. VISUALIZAÇÃO DE SUCESSO
-                    if successful_contacts:
-                        st.subheader("✅ Contatos Padronizados (Incluídos no VCF)")
-                        st.info(f"Total de {len(successful_contacts)} contatos validados.")
-                        success_df = pd.DataFrame(successful_contacts)
-                        # Reordena colunas
-                        columns_order = ["Índice_Linha_Original", "Nome do Responsável", "Nome do Aluno", "Nome da Turma", "Número Original", "Número Padronizado (E.164)", "Visualização VCF"]
-                        success_df = success_df[columns_order]
-                        st.dataframe(
-                            success_df,
-                            use_container_width=True,
-                            height=300
-                        )
-                        st.markdown("---")
-                    
-                    # 2. VISUALIZAÇÃO DE FALHA
-                    if failed_contacts:
-                        st.subheader("❌ Lista de Números que Falharam (Dados Completos + Explicação Manual)")
-                        st.warning(f"⚠️ **{len(failed_contacts)}** contato(s) falhou(aram) na padronização e NÃO foram incluídos no VCF.")
-                        
-                        # Converte a lista de dicionários para DataFrame para exibição no Streamlit
-                        failed_df = pd.DataFrame(failed_contacts)
-                        
-                        # Definição das colunas de exibição e suas configurações
-                        failed_columns_config = {
-                            "Índice_Linha_Original": st.column_config.NumberColumn("Linha"),
-                            "Nome do Responsável": st.column_config.TextColumn("Responsável"),
-                            "Nome do Aluno": st.column_config.TextColumn("Aluno"),
-                            "Nome da Turma": st.column_config.TextColumn("Turma"), 
-                            "Telefone": st.column_config.TextColumn("Telefone"), 
-                            # Configurações para estender o texto
-                            "Motivo_da_Falha": st.column_config.Column(
-                                "Motivo da Falha",
-                                width="large",
-                                help="Por que o número falhou na padronização.",
-                            ),
-                            "Explicação_Manual": st.column_config.Column(
-                                "Explicação_Manual", # Trocado de AI para Manual
-                                width="large",
-                                help="Diagnóstico manual para o formato incorreto."
-                            ),
-                            # Adicionar as demais colunas do Excel para 'Dados Completos'
-                        }
-                        
-                        # Reordena colunas para exibir as colunas chave primeiro
-                        failed_columns_order = [
-                            "Índice_Linha_Original", 
-                            "Nome do Responsável", 
-                            "Nome do Aluno", 
-                            "Nome da Turma", 
-                            "Telefone",
-                            "Motivo_da_Falha", 
-                            "Explicação_Manual"
-                        ]
-                        
-                        # Garante que apenas colunas existentes sejam usadas
-                        existing_cols = [col for col in failed_columns_order if col in failed_df.columns]
-                        failed_df = failed_df[existing_cols]
-
-                        # Filtrar o column_config para apenas colunas existentes e usáveis
-                        config_to_use = {k: v for k, v in failed_columns_config.items() if k in existing_cols}
-
-                        st.dataframe(
-                            failed_df, 
-                            column_config=config_to_use, 
-                            use_container_width=True,
-                            height=300 
-                        )
-                        
-                    elif valid_count > 0:
-                        st.info("🎉 Todos os contatos do seu arquivo foram processados com sucesso!")
-                    
-                    st.markdown("---")
-
-
-            elif path == 'PATH B: Integração WhatsApp Cloud API (Empresarial)':
-                # --- PATH B: API CREDENTIALS ---
-                st.subheader("Configuração do WhatsApp Cloud API")
-                st.warning("⚠️ **Atenção:** Certifique-se de que seu template está APROVADO.")
-                
-                # Campos dinâmicos para credenciais
-                api_token = st.text_input("Access Token da Meta:", type="password", key='api_token_input')
-                phone_id = st.text_input("Phone Number ID (ID do Telefone no Meta):", key='phone_id_input')
-                template_name = st.text_input("Nome do Template Aprovado (Ex: 'ola_novo_cliente'):", key='template_name_input')
-                
-                st.info("Atenção: A lógica assume que o primeiro placeholder do seu template é o nome do contato.")
-
-                if st.button("🚀 Iniciar Envio de Mensagens via API", key="btn_api_send"):
-                    if not all([api_token, phone_id, template_name]):
-                        st.error("Por favor, preencha todos os campos de credenciais da API.")
-                        return
-
-                    st.markdown("---")
-                    st.header("Registro de Execução da API")
-                    
-                    results = []
-                    status_log = st.empty()
-                    
-                    total_rows = len(df)
-                    success_count = 0
-                    failure_count = 0
-                    
-                    # Cria um DataFrame temporário para o relatório e o exibe para updates em tempo real
-                    results_df = pd.DataFrame(columns=["Nome do Responsável", "Nome do Aluno", "Número Original", "Status", "Detalhe da Falha"])
-                    results_container = st.empty()
-                    results_container.dataframe(results_df)
-
-                    for index, row in df.iterrows():
-                        # Obtém os nomes
-                        responsible_name = str(row.get(st.session_state['responsible_name_col'], 'Responsável Desconhecido'))
-                        student_name = str(row.get(st.session_state['student_name_col'], 'Aluno Desconhecido'))
-                        original_phone = str(row.get(st.session_state['phone_col'], ''))
-                        
-                        contact_name = f"{responsible_name} / {student_name}" 
-                        
-                        # Módulo 22: Otimização de Código - Usa nova tupla de retorno
-                        cleaned_phone, failure_reason = clean_and_standardize_phone(original_phone, st.session_state['default_cc'])
-                        
-                        current_result = {
-                            "Nome do Responsável": responsible_name, 
-                            "Nome do Aluno": student_name, 
-                            "Número Original": original_phone,
-                            "Status": "...",
-                            "Detalhe da Falha": ""
-                        }
-
-                        if not cleaned_phone:
-                            failure_count += 1
-                            current_result.update({"Status": "❌ Falha", "Detalhe da Falha": f"Número Limpo/Formatado Inválido. Motivo: {failure_reason or 'Desconhecido'}"})
-                        else:
-                            # Simulação de atraso (boas práticas de API)
-                            time.sleep(0.5) 
-                            
-                            # Chama a função da API
-                            api_response = send_whatsapp_template_message(
-                                phone_id,
-                                api_token,
-                                cleaned_phone,
-                                template_name,
-                                responsible_name 
-                            )
-
-                            if api_response['status'] == 'Success':
-                                success_count += 1
-                                current_result.update({
-                                    "Status": "✅ Sucesso", 
-                                    "Detalhe da Falha": f"ID da Mensagem: {api_response['data'].get('messages', [{}])[0].get('id', 'N/A')}"
-                                })
-                            else:
-                                failure_count += 1
-                                current_result.update({"Status": "❌ Falha", "Detalhe da Falha": api_response['detail']})
-
-                        # Atualiza o DataFrame do relatório
-                        results_df.loc[index] = current_result
-                        results_container.dataframe(results_df.style.apply(lambda s: ['background-color: #ffcccc' if 'Falha' in v else '' for v in s], subset=['Status', 'Detalhe da Falha']))
-                        
-                        # Atualiza o log de progresso
-                        status_log.write(f"Processando contato {index+1}/{total_rows}... (Sucessos: {success_count}, Falhas: {failure_count})")
-
-                    # Relatório Final
-                    st.markdown("---")
-                    st.success(f"Processo Concluído! Total de Contatos: {total_rows}")
-                    st.metric(label="Mensagens Enviadas com Sucesso", value=success_count)
-                    st.metric(label="Falhas no Envio", value=failure_count)
-                    
-                    status_log.empty() # Remove o status de processamento
-
-        except Exception as e:
-            st.error(f"Ocorreu um erro no processamento do arquivo: {e}")
-            st.warning("Verifique se as colunas e o formato do arquivo estão corretos. Erro técnico: " + str(e))
-
-    else:
-        st.info("Aguardando o upload do seu arquivo Excel ou CSV.")
-
-if __name__ == '__main__':
-    main()
+import streamlit as st
+import pandas as pd
+import numpy as np
+import requests
+import re
+import csv
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional, Dict, Any, Tuple, List, Callable
+
+# aiohttp é opcional: sem ele, o PATH B usa o caminho sequencial com requests.
+try:
+    import aiohttp
+    _HAS_AIOHTTP = True
+except ImportError:
+    _HAS_AIOHTTP = False
+
+# polars é opcional: leitor de CSV multithread (Rust), bem mais rápido que o
+# pandas em arquivos grandes; sem ele, o load cai no pd.read_csv.
+try:
+    import polars as pl
+    _HAS_POLARS = True
+except ImportError:
+    _HAS_POLARS = False
+
+# orjson é opcional: serialização JSON em C, relevante principalmente para os
+# payloads do endpoint batch (50 sub-requisições por POST).
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serializa para JSON em bytes UTF-8, com orjson quando disponível."""
+    if _HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+from requests.adapters import HTTPAdapter, Retry
+
+# Sessão HTTP compartilhada para o caminho síncrono: reutiliza a conexão
+# TCP/TLS com graph.facebook.com entre envios (keep-alive) em vez de abrir
+# um handshake novo por contato, com retry/backoff para erros transitórios.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=64,
+    # Envio de template NÃO é idempotente: um 5xx ou timeout de leitura pode
+    # chegar depois de a Meta já ter aceitado a mensagem, e reenviar
+    # automaticamente duplicaria o disparo para o responsável. O retry
+    # automático fica restrito a 429 (pedido rejeitado, seguro reenviar) e a
+    # falhas de estabelecimento de conexão (nada foi enviado); read=0 faz
+    # erros de leitura estourarem como falha no relatório, para reenvio
+    # deliberado pelo operador. allowed_methods=None inclui POST no retry.
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=[429],
+        allowed_methods=None,
+    ),
+))
+
+# --- CONSTANTES DE MAPEAMENTO FIXO (REMOVIDAS, AGORA SÓ HINTS) ---
+# Nenhuma chave ou constante de AI é necessária, pois o mapeamento é fixo.
+# ----------------------------------------------------
+
+# Regex compilada uma única vez no import: evita o lookup no cache interno
+# do re a cada linha processada. re.ASCII restringe o \d a '0'-'9': é o que
+# o caminho vetorizado já faz (o RE2 das strings Arrow do pandas só conhece
+# \d ASCII), e um telefone com dígitos árabes/devanágari deve ser rejeitado,
+# não convertido.
+_NON_DIGIT_RE = re.compile(r'\D', re.ASCII)
+
+# Tabela de deleção para str.translate: um único loop em C, sem a máquina de
+# estados do regex. Cobre o Latin-1; caracteres acima disso caem no regex.
+_KEEP_DIGITS = str.maketrans('', '', ''.join(chr(c) for c in range(256) if not ('0' <= chr(c) <= '9')))
+
+def _extract_digits(raw: str) -> str:
+    """Remove tudo que não é dígito ASCII, com translate como caminho rápido."""
+    if raw.isascii() and raw.isdecimal():
+        # Caso comum de células numéricas do Excel já renderizadas como
+        # '5531999998888': nada a remover, evita o translate
+        return raw
+    digits = raw.translate(_KEEP_DIGITS)
+    if digits and not digits.isascii():
+        # Sobrou caractere fora do Latin-1 (ex.: travessão ou dígito árabe):
+        # completa com regex
+        digits = _NON_DIGIT_RE.sub('', digits)
+    return digits
+
+
+# --- I. FUNÇÕES CRÍTICAS DE PROCESSAMENTO (Simplificadas) ---
+
+def clean_and_standardize_phone(number: str, default_country_code: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Limpa o número de telefone, removendo caracteres não-dígitos e
+    garantindo o formato E.164 (código do país + DDD + Número).
+
+    Memoizada: listas de contato costumam repetir o mesmo número bruto
+    (e os fluxos de preview/VCF/API validam a mesma coluna mais de uma
+    vez), então duplicatas viram um hit O(1) no LRU.
+
+    Retorna uma tupla (numero_padronizado, motivo_falha).
+    """
+    if not number:
+        return None, "Número de entrada vazio ou nulo."
+    return _clean_phone_cached(str(number), default_country_code)
+
+@lru_cache(maxsize=131072)
+def _clean_phone_cached(number: str, default_country_code: str) -> Tuple[Optional[str], Optional[str]]:
+    """Núcleo puro de clean_and_standardize_phone, cacheado por string de entrada."""
+    # Assume que o CC é os 2 primeiros dígitos e o DD é o restante da string de configuração
+    CC = default_country_code[:2] if len(default_country_code) >= 2 else "55" 
+    DD = default_country_code[2:4] if len(default_country_code) >= 4 else "31"
+    
+    # --- NOVIDADE: Pré-validação do formato visual do hífen (Corrigido) ---
+    raw_number_str = str(number)
+    if '-' in raw_number_str:
+        parts = raw_number_str.split('-')
+        
+        # Deve ter exatamente um hífen
+        if len(parts) != 2:
+             return None, "Formato do hífen inválido. Deve ter exatamente um hífen."
+        
+        # Remove caracteres não-dígitos das partes para contagem
+        part2_clean = _extract_digits(parts[1])
+
+        # Se a parte 2 não tiver 4 dígitos, falha conforme regra do usuário.
+        # Esta é a validação rigorosa para rejeitar números como XXXX-147 (3 dígitos).
+        if len(part2_clean) != 4:
+            return None, f"A segunda parte do número (após o hífen) deve conter exatamente 4 dígitos. Encontrado: {len(part2_clean)} dígitos."
+            
+    
+    # 1. Converte para string e remove todos os caracteres não-dígitos
+    cleaned_number = _extract_digits(str(number))
+    phone_length = len(cleaned_number)
+
+    # ----------------------------------------------------------------------
+    # LÓGICA AVANÇADA DE PADRONIZAÇÃO (Baseado em 55 e 31)
+    # ----------------------------------------------------------------------
+    
+    # Verifica se o número já tem o CC (Ex: 55)
+    has_cc = cleaned_number.startswith(CC)
+    
+    # Tratamento de números de 12 dígitos que são 55 + DD + 8 dígitos (faltando o '9')
+    if phone_length == 12 and has_cc:
+        # Padrão: 55 + DD + 8 dígitos. (Ex: 553187654321)
+        inferred_number = cleaned_number[:4] + '9' + cleaned_number[4:]
+        return inferred_number, None
+        
+    # Número com exatamente 10 dígitos (DD + 8 dígitos, assumindo falta de 55 e '9')
+    if phone_length == 10:
+        # O número é DD + 8 dígitos (ex: 3187654321).
+        inferred_number = CC + cleaned_number[:2] + '9' + cleaned_number[2:]
+        return inferred_number, None 
+
+    # Caso 1: Número Local (8 ou 9 dígitos). Faltam CC e DD.
+    if phone_length in [8, 9]:
+        return CC + DD + cleaned_number, None
+
+    # Caso 2: Número com DDD (11 dígitos). Falta o CC.
+    if phone_length == 11:
+        if cleaned_number.startswith(DD):
+            return CC + cleaned_number, None
+        else:
+            return CC + cleaned_number, None
+
+    # Caso 3: Número Internacional Completo (13 dígitos).
+    if phone_length == 13:
+        if has_cc:
+            return cleaned_number, None
+        
+    # Caso 4: Outros tamanhos (Muito longo ou muito curto/Inválido)
+    if phone_length < 8:
+        return None, f"Número muito curto ({phone_length} dígitos)."
+    if phone_length > 13 and not has_cc:
+        return None, f"Número muito longo sem Código de País ({phone_length} dígitos)."
+
+    # Se nenhuma regra de padronização se aplicou ou se o número é inválido
+    return None, f"Tamanho inválido ou não padronizável ({phone_length} dígitos)."
+
+def clean_phone_series(s: pd.Series, default_country_code: str) -> Tuple[pd.Series, pd.Series]:
+    """
+    Versão vetorizada de `clean_and_standardize_phone` para a coluna inteira.
+
+    Aplica as mesmas regras de padronização (hífen, inferência do '9',
+    CC/DDD, só dígitos ASCII contam) de uma só vez sobre a Series, usando
+    operações .str do pandas e máscaras booleanas do NumPy, em vez de uma
+    chamada Python por linha.
+
+    Retorna uma tupla (numeros_padronizados, motivos_falha), ambas Series
+    alinhadas ao índice de entrada, com None onde não se aplica.
+    """
+    CC = default_country_code[:2] if len(default_country_code) >= 2 else "55"
+    DD = default_country_code[2:4] if len(default_country_code) >= 4 else "31"
+
+    raw = s.fillna('').astype(str).str.strip()
+
+    # Pré-validação do formato visual do hífen (mesmas regras do caminho escalar)
+    hyphen_count = raw.str.count('-').to_numpy()
+    part2_digits = raw.str.split('-', n=1).str[1].fillna('').str.replace(r'[^0-9]', '', regex=True)
+    part2_len = part2_digits.str.len().to_numpy()
+    bad_hyphen = hyphen_count > 1
+    bad_part2 = (hyphen_count == 1) & (part2_len != 4)
+
+    # Sanitização: mantém apenas dígitos ASCII. A classe explícita [^0-9]
+    # significa o mesmo no re do stdlib e no RE2 das strings Arrow (onde o
+    # \D seria ASCII-only de qualquer forma), casando com o caminho escalar
+    d = raw.str.replace(r'[^0-9]', '', regex=True)
+    arr = d.to_numpy()
+    L = d.str.len().to_numpy()
+    has_cc = d.str.startswith(CC).to_numpy()
+
+    empty = (raw == '').to_numpy()
+    invalid_format = empty | bad_hyphen | bad_part2
+
+    # Uma única passada de classificação: cada linha recebe um código de
+    # categoria, e a montagem/mensagem é feita só sobre o subconjunto da sua
+    # categoria, sem materializar Series intermediárias do tamanho total por
+    # ramo. Ordem de precedência idêntica à da função escalar.
+    CAT_BAD_FORMAT, CAT_12, CAT_10, CAT_89, CAT_11, CAT_13, CAT_SHORT, CAT_LONG, CAT_OTHER = range(9)
+    cat = np.select(
+        [
+            invalid_format,
+            (L == 12) & has_cc,       # 55 + DD + 8 dígitos (falta o '9')
+            L == 10,                  # DD + 8 dígitos (faltam 55 e '9')
+            (L == 8) | (L == 9),      # número local (faltam CC e DDD)
+            L == 11,                  # DDD + 9 dígitos (falta o CC)
+            (L == 13) & has_cc,       # internacional completo
+            L < 8,
+            (L > 13) & ~has_cc,
+        ],
+        [CAT_BAD_FORMAT, CAT_12, CAT_10, CAT_89, CAT_11, CAT_13, CAT_SHORT, CAT_LONG],
+        default=CAT_OTHER,
+    )
+
+    out = np.full(len(arr), None, dtype=object)
+    m = cat == CAT_12
+    out[m] = [x[:4] + '9' + x[4:] for x in arr[m]]
+    m = cat == CAT_10
+    out[m] = [CC + x[:2] + '9' + x[2:] for x in arr[m]]
+    m = cat == CAT_89
+    out[m] = [CC + DD + x for x in arr[m]]
+    m = cat == CAT_11
+    out[m] = [CC + x for x in arr[m]]
+    m = cat == CAT_13
+    out[m] = arr[m]
+
+    reasons = np.full(len(arr), None, dtype=object)
+    reasons[empty] = "Número de entrada vazio ou nulo."
+    reasons[bad_hyphen & ~empty] = "Formato do hífen inválido. Deve ter exatamente um hífen."
+    m = bad_part2 & ~bad_hyphen & ~empty
+    reasons[m] = [
+        f"A segunda parte do número (após o hífen) deve conter exatamente 4 dígitos. Encontrado: {n} dígitos."
+        for n in part2_len[m]
+    ]
+    m = cat == CAT_SHORT
+    reasons[m] = [f"Número muito curto ({n} dígitos)." for n in L[m]]
+    m = cat == CAT_LONG
+    reasons[m] = [f"Número muito longo sem Código de País ({n} dígitos)." for n in L[m]]
+    m = cat == CAT_OTHER
+    reasons[m] = [f"Tamanho inválido ou não padronizável ({n} dígitos)." for n in L[m]]
+
+    return (
+        pd.Series(out, index=s.index, dtype=object),
+        pd.Series(reasons, index=s.index, dtype=object),
+    )
+
+def format_phone_for_vcf(e164_number: str) -> str:
+    """
+    Formata um número E.164 (ex: 5531987654321) para o formato visual solicitado: 
+    +CC (DD) 9XXXX-XXXX
+    """
+    if not e164_number or len(e164_number) != 13:
+        return e164_number
+
+    # Formato: +55 (31) 98765-4321 — concatenação direta das fatias, sem
+    # locais intermediários nem a máquina de formatação do f-string
+    n = e164_number
+    return '+' + n[:2] + ' (' + n[2:4] + ') ' + n[4:9] + '-' + n[9:]
+
+
+def format_phone_for_vcf_series(s: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de `format_phone_for_vcf` para uma Series de números
+    E.164: as fatias e concatenações rodam nos kernels .str do pandas em vez
+    de uma chamada Python por contato. Números fora do tamanho esperado (13
+    dígitos) passam inalterados, como no caminho escalar.
+    """
+    formatted = '+' + s.str[:2] + ' (' + s.str[2:4] + ') ' + s.str[4:9] + '-' + s.str[9:13]
+    return pd.Series(np.where(s.str.len() == 13, formatted, s), index=s.index, dtype=object)
+
+# Explicações locais por prefixo do motivo de falha: cada motivo emitido pela
+# validação é determinístico, então o diagnóstico correspondente pode ser
+# resolvido por tabela, sem nenhum serviço externo
+_LOCAL_EXPLANATIONS = {
+    "Número de entrada vazio ou nulo.": "A célula de telefone está vazia. Preencha o número com DDD (ex: 31 98765-4321).",
+    "Formato do hífen inválido.": "Use no máximo um hífen, separando apenas os 4 últimos dígitos (ex: 98765-4321).",
+    "A segunda parte do número": "Após o hífen devem vir exatamente os 4 últimos dígitos (ex: 98765-4321).",
+    "Número muito curto": "Faltam dígitos: um celular completo tem DDD + 9 dígitos (ex: 31 98765-4321).",
+    "Número muito longo": "Há dígitos demais para um número sem Código de País. Confira se não sobraram dígitos digitados por engano.",
+    "Tamanho inválido": "O total de dígitos não corresponde a nenhum formato reconhecido (fixo ou celular, com ou sem o 55). Confira DDD e 9º dígito.",
+}
+
+_DEFAULT_EXPLANATION = "O número não pôde ser padronizado. Verifique se ele contém o DDD e o 9º dígito se for celular."
+
+
+def _explain_failure(failure_reason: Optional[str]) -> str:
+    """Retorna a explicação local correspondente ao motivo de falha."""
+    if failure_reason:
+        for prefix, explanation in _LOCAL_EXPLANATIONS.items():
+            if failure_reason.startswith(prefix):
+                return explanation
+    return _DEFAULT_EXPLANATION
+
+# --- PATH A: VCF (vCard) GENERATION ---
+
+def generate_vcf_bytes(df: pd.DataFrame, responsible_name_col: str, student_name_col: str, phone_col: str, turma_name_col: str, cleaned_series: pd.Series, reason_series: pd.Series, failed_contacts: list, successful_contacts: list) -> bytes:
+    """
+    Gera o conteúdo de um único arquivo VCF (vCard) a partir do DataFrame,
+    já codificado em UTF-8. Escrever os blocos direto num BytesIO evita
+    manter o texto inteiro e a cópia em bytes lado a lado na memória.
+    Recebe a coluna de telefones já validada (`cleaned_series`/`reason_series`,
+    ver clean_phone_series) em vez de revalidar internamente.
+    Preenche as listas `failed_contacts` e `successful_contacts`.
+    """
+    buf = BytesIO()
+
+    # Materializa como arrays numpy: o loop restante itera sem passar pela
+    # indexação do pandas a cada linha.
+    responsible_names = df[responsible_name_col].fillna('').astype(str).str.strip().to_numpy()
+    student_names = df[student_name_col].fillna('').astype(str).str.strip().to_numpy()
+    turma_names = df[turma_name_col].fillna('').astype(str).str.strip().to_numpy()
+    original_phones = df[phone_col].fillna('').astype(str).str.strip().to_numpy()
+    cleaned_phones = cleaned_series.to_numpy()
+    failure_reasons = reason_series.to_numpy()
+
+    row_indices = df.index.to_numpy()
+    valid = (responsible_names != '') & pd.notnull(cleaned_phones)
+
+    # Montagem vetorizada dos blocos: a concatenação de Series roda em loop C
+    # sobre os arrays, em vez de um .format por contato no interpretador.
+    resp_v = responsible_names[valid]
+    stud_v = student_names[valid]
+    cleaned_v = cleaned_phones[valid]
+    # Formata o número SOMENTE para o bloco VCF para visualização
+    formatted_v = format_phone_for_vcf_series(pd.Series(cleaned_v, dtype=object)).to_numpy()
+    # Monta o nome completo do contato (Responsável + Aluno) para o VCF
+    full_v = np.where(stud_v != '', resp_v + ' - ' + stud_v, resp_v)
+
+    blocks = (
+        "BEGIN:VCARD\nVERSION:3.0\nFN:" + pd.Series(full_v, dtype=object)
+        + "\nN:;" + pd.Series(resp_v, dtype=object)
+        + ";;;\nTEL;TYPE=CELL:" + pd.Series(formatted_v, dtype=object)
+        + "\nEND:VCARD"
+    ).tolist()
+
+    # Junta e codifica em fatias de 10k blocos para limitar o pico de memória
+    # do join+encode em listas muito grandes
+    for start in range(0, len(blocks), 10000):
+        if start:
+            buf.write(b'\n')
+        buf.write('\n'.join(blocks[start:start + 10000]).encode('utf-8'))
+
+    # Relatórios de sucesso/falha para visualização (apenas custo proporcional
+    # a cada subconjunto)
+    for index, responsible_name, student_name, turma_name, original_phone, cleaned_phone_e164, formatted_phone in zip(
+        row_indices[valid], resp_v, stud_v, turma_names[valid],
+        original_phones[valid], cleaned_v, formatted_v
+    ):
+        successful_contacts.append({
+            "Índice_Linha_Original": index + 1,
+            "Nome do Responsável": responsible_name,
+            "Nome do Aluno": student_name,
+            "Nome da Turma": turma_name,
+            "Número Original": original_phone,
+            "Número Padronizado (E.164)": cleaned_phone_e164,
+            "Visualização VCF": formatted_phone
+        })
+
+    invalid = ~valid
+    if invalid.any():
+        # Metadados do erro em colunas, construídos de uma vez sobre o
+        # subconjunto inválido
+        fail_meta = pd.DataFrame({
+            "Índice_Linha_Original": row_indices[invalid] + 1,
+            "Nome do Responsável": responsible_names[invalid],
+            "Nome do Aluno": student_names[invalid],
+            "Nome da Turma": turma_names[invalid],
+            "Telefone": original_phones[invalid],
+            "Motivo_da_Falha": [r or "Nome ou Número Limpo Inválido." for r in failure_reasons[invalid]],
+            "Explicação_Manual": [_explain_failure(r) for r in failure_reasons[invalid]],
+        })
+        # Só os metadados entram no relatório: a tabela de falhas exibe
+        # exatamente essas colunas, então copiar a linha original inteira para
+        # cada dict (como era feito antes) duplicava toda célula da planilha
+        # larga sem nunca mostrá-la. Quem precisar da linha completa tem o
+        # Índice_Linha_Original para localizá-la no arquivo.
+        failed_contacts.extend(fail_meta.to_dict('records'))
+
+    return buf.getvalue()
+
+# --- PATH B: WHATSAPP CLOUD API INTEGRATION ---
+
+# Partes imutáveis do payload de template, construídas uma única vez no
+# módulo: por mensagem só variam o destinatário, o nome do template e o
+# texto do placeholder
+_TEMPLATE_LANGUAGE = {"code": "pt_BR"}
+
+
+def _extract_msg_id(data: Dict[str, Any]) -> str:
+    """Extrai o ID (wamid) da resposta da API, sem alocar listas temporárias."""
+    msgs = data.get('messages')
+    if msgs:
+        return msgs[0].get('id', 'N/A')
+    return 'N/A'
+
+
+@lru_cache(maxsize=8)
+def _auth_headers(access_token: str) -> Dict[str, str]:
+    """Headers de autenticação, imutáveis entre as mensagens de um envio."""
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+
+def _build_template_payload(recipient_number: str, template_name: str, contact_name: str) -> Dict[str, Any]:
+    """Monta o payload de mensagem de template (assumindo o placeholder {{1}} para o nome)."""
+    return {
+        "messaging_product": "whatsapp",
+        "to": recipient_number,
+        "type": "template",
+        "template": {
+            "name": template_name,
+            "language": _TEMPLATE_LANGUAGE,
+            "components": [
+                {
+                    "type": "body",
+                    "parameters": [
+                        {
+                            # Substitui o placeholder {{1}} pelo nome do contato
+                            "type": "text",
+                            "text": contact_name
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+def _style_failures(results_df: pd.DataFrame):
+    """
+    Realça as linhas com falha no relatório de envio. A máscara de falha é
+    calculada uma única vez e reutilizada nas colunas estilizadas, em vez de
+    reconstruir uma lambda com comparação por célula a cada render.
+    """
+    colors = np.where(
+        results_df['Status'].str.contains('Falha', regex=False).to_numpy(),
+        'background-color: #ffcccc',
+        '',
+    )
+    return results_df.style.apply(lambda s: colors, axis=0, subset=['Status', 'Detalhe da Falha'])
+
+class RateLimiter:
+    """
+    Limitador de taxa síncrono: garante um intervalo mínimo de 1/rps entre
+    chamadas, com relógio monotônico e Lock para uso seguro entre threads.
+    Substitui o time.sleep fixo, que limitava o envio a 2 msg/s
+    independentemente da taxa permitida para o template.
+    """
+    def __init__(self, rps: float):
+        self._interval = 1.0 / rps if rps > 0 else 0.0
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+class AsyncRateLimiter:
+    """
+    Limitador de taxa simples (intervalo mínimo entre requisições) para o
+    caminho assíncrono. Garante no máximo `rps` requisições por segundo
+    independente de quantas tasks estejam em voo.
+    """
+    def __init__(self, rps: float):
+        self._interval = 1.0 / rps if rps > 0 else 0.0
+        self._next_allowed = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+async def _send_one_async(
+    session,
+    sem: "asyncio.Semaphore",
+    limiter: AsyncRateLimiter,
+    phone_number_id: str,
+    access_token: str,
+    recipient_number: str,
+    template_name: str,
+    contact_name: str,
+    max_retries: int = 3,
+) -> Dict[str, Any]:
+    """Envia uma mensagem via aiohttp, com retentativa apenas para 429 e
+    falhas de estabelecimento de conexão (envio não é idempotente)."""
+    url = f"https://graph.facebook.com/v19.0/{phone_number_id}/messages"
+    payload = _build_template_payload(recipient_number, template_name, contact_name)
+    headers = _auth_headers(access_token)
+
+    async with sem:
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
+            try:
+                async with session.post(
+                    url, data=_json_dumps(payload), headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=10)
+                ) as response:
+                    # Só o 429 é seguro de reenviar (o pedido foi rejeitado).
+                    # A API informa quanto esperar via Retry-After — respeitar o
+                    # valor evita retentativas que tropeçam de novo no limite
+                    if response.status == 429:
+                        if attempt < max_retries:
+                            try:
+                                retry_after = float(response.headers.get('Retry-After', 0) or 0)
+                            except ValueError:
+                                retry_after = 0.0
+                            await asyncio.sleep(retry_after if retry_after > 0 else 0.5 * (2 ** attempt))
+                            continue
+                    data = await response.json(content_type=None)
+                    if response.status < 400:
+                        return {"status": "Success", "id": _extract_msg_id(data)}
+                    # 5xx inclusive: a Meta pode já ter aceitado a mensagem, e
+                    # reenviar às cegas duplicaria o disparo — registra como
+                    # falha para reenvio deliberado pelo operador
+                    error_detail = data.get('error', {}).get('message', 'Erro HTTP desconhecido.')
+                    return {"status": "Failure", "detail": f"HTTP Error: {response.status}. Detalhe: {error_detail}"}
+            except aiohttp.ClientConnectorError as e:
+                # Falha ao estabelecer a conexão: nada foi enviado, reenviar é seguro
+                if attempt < max_retries:
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+                    continue
+                return {"status": "Failure", "detail": f"Erro de Conexão: {e}"}
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Erro/timeout depois do envio: a requisição pode já ter sido
+                # processada — sem reenvio automático, pelo mesmo motivo dos 5xx
+                return {"status": "Failure", "detail": f"Erro de Conexão: {e}"}
+        return {"status": "Failure", "detail": "Número máximo de tentativas excedido."}
+
+async def _send_all_async(
+    contacts: List[Tuple[str, str]],
+    phone_number_id: str,
+    access_token: str,
+    template_name: str,
+    max_concurrency: int = 50,
+    rps: float = 10.0,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Dispara todos os envios concorrentemente, limitados por um Semaphore
+    (concorrência global) e por um AsyncRateLimiter (mensagens/segundo).
+    `contacts` é uma lista de tuplas (numero_e164, nome_do_contato).
+    Retorna os resultados na mesma ordem de entrada.
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+    limiter = AsyncRateLimiter(rps)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(contacts)
+    done_count = 0
+
+    async def run_one(i: int, number: str, name: str):
+        nonlocal done_count
+        results[i] = await _send_one_async(
+            session, sem, limiter, phone_number_id, access_token, number, template_name, name
+        )
+        done_count += 1
+        if progress_cb:
+            progress_cb(done_count, len(contacts))
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[
+            run_one(i, number, name) for i, (number, name) in enumerate(contacts)
+        ])
+
+    return results
+
+# Endpoint batch do Graph API: aceita até 50 sub-requisições por POST
+_GRAPH_BATCH_URL = "https://graph.facebook.com/v19.0/"
+_GRAPH_BATCH_SIZE = 50
+
+def send_whatsapp_template_batch(
+    phone_number_id: str,
+    access_token: str,
+    contacts: List[Tuple[str, str]],
+    template_name: str
+) -> List[Dict[str, Any]]:
+    """
+    Envia até 50 mensagens de template em um único POST via o endpoint batch
+    do Graph API (1 handshake/RTT por lote em vez de 1 por contato).
+
+    `contacts` é uma lista de tuplas (numero_e164, nome_do_contato).
+    Retorna uma lista de resultados alinhada à entrada, no mesmo formato de
+    `send_whatsapp_template_message`. Se o POST do lote em si falhar, cai
+    para o envio individual de cada contato.
+    """
+    batch = [
+        {
+            "method": "POST",
+            "relative_url": f"{phone_number_id}/messages",
+            "headers": [{"name": "Content-Type", "value": "application/json"}],
+            "body": _json_dumps(_build_template_payload(number, template_name, name)).decode('utf-8'),
+        }
+        for number, name in contacts
+    ]
+
+    try:
+        response = _SESSION.post(
+            _GRAPH_BATCH_URL,
+            data={"access_token": access_token, "batch": _json_dumps(batch).decode('utf-8')},
+            timeout=30,
+        )
+        response.raise_for_status()
+
+        results = []
+        for item in response.json():
+            # Cada item traz {code, body} da sub-requisição correspondente
+            if item and item.get('code', 500) < 400:
+                body = json.loads(item.get('body') or '{}')
+                results.append({"status": "Success", "id": _extract_msg_id(body)})
+            else:
+                body = json.loads(item.get('body') or '{}') if item else {}
+                error_detail = body.get('error', {}).get('message', 'Erro HTTP desconhecido.')
+                code = item.get('code', 'N/A') if item else 'N/A'
+                results.append({"status": "Failure", "detail": f"HTTP Error: {code}. Detalhe: {error_detail}"})
+        return results
+
+    except requests.exceptions.HTTPError:
+        # O lote inteiro foi rejeitado (ex.: token inválido): tenta um a um
+        # para preservar o diagnóstico individual por contato
+        return [
+            send_whatsapp_template_message(phone_number_id, access_token, number, template_name, name)
+            for number, name in contacts
+        ]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return [{"status": "Failure", "detail": f"Erro de Conexão: {e}"}] * len(contacts)
+
+def send_whatsapp_template_message(
+    phone_number_id: str, 
+    access_token: str, 
+    recipient_number: str, 
+    template_name: str, 
+    contact_name: str
+) -> Dict[str, Any]:
+    """Envia uma mensagem de template via WhatsApp Cloud API."""
+    
+    # 1. Constrói o URL da API
+    url = f"https://graph.facebook.com/v19.0/{phone_number_id}/messages"
+
+    # 2. Constrói o payload da mensagem (assumindo o placeholder {{1}} para o nome)
+    payload = _build_template_payload(recipient_number, template_name, contact_name)
+
+    # 3. Cabeçalhos de autenticação (cacheados por token)
+    headers = _auth_headers(access_token)
+
+
+    try:
+        # data= com o payload já serializado evita o json.dumps interno do requests
+        response = _SESSION.post(url, headers=headers, data=_json_dumps(payload), timeout=10)
+        response.raise_for_status()
+        # Guarda apenas o ID da mensagem: é o único campo que o relatório usa
+        return {"status": "Success", "id": _extract_msg_id(response.json())}
+    except requests.exceptions.HTTPError as e:
+        # Erros da API (ex: token inválido, template não encontrado). O corpo
+        # pode nem ser JSON (páginas de erro HTML): parse defensivo com
+        # fallback para um prefixo do texto cru.
+        try:
+            error_detail = e.response.json().get('error', {}).get('message', 'Erro HTTP desconhecido.')
+        except ValueError:
+            error_detail = e.response.text[:200]
+        return {"status": "Failure", "detail": f"HTTP Error: {e.response.status_code}. Detalhe: {error_detail}"}
+    except requests.exceptions.RequestException as e:
+        # Erros de conexão (ex: timeout, DNS)
+        return {"status": "Failure", "detail": f"Erro de Conexão: {e}"}
+
+# --- II. ESTRUTURA E INTERFACE DO STREAMLIT ---
+
+# Função auxiliar para sugerir a coluna inicial (se houver correspondência)
+def find_initial_column(columns, hint, pattern=None):
+    """Tenta encontrar uma coluna que corresponda ao hint ('Turma', 'Aluno', etc.) para pre-seleção."""
+    # Prioriza correspondência exata, depois correspondência sem espaços (normalizada)
+    if hint in columns:
+        return hint
+
+    normalized_hint = hint.strip().lower()
+    for col in columns:
+        if col.strip().lower() == normalized_hint:
+             return col
+    # Correspondência parcial via regex precompilada (ex.: 'Telefone do
+    # Responsável' casa com o campo de telefone)
+    if pattern is not None:
+        for col in columns:
+            if pattern.search(col):
+                return col
+    # Se não encontrar, retorna a primeira coluna como fallback
+    return columns[0] if columns else None
+
+
+# Mapeamento dos campos necessários e seus hints para pre-seleção
+_FIELDS_TO_MAP = {
+    "responsible_name_col": "Responsável",
+    "student_name_col": "Aluno",
+    "turma_name_col": "Turma",
+    "phone_col": "Telefone",
+}
+
+# Padrões precompilados para correspondência parcial de cada campo, usados
+# quando nenhum nome de coluna bate exatamente com o hint
+_FIELD_PATTERNS = {
+    "responsible_name_col": re.compile(r'respons|pai|m[ãa]e', re.I),
+    "student_name_col": re.compile(r'aluno|estudante', re.I),
+    "turma_name_col": re.compile(r'turma|classe|s[ée]rie', re.I),
+    "phone_col": re.compile(r'telefone|celular|fone|phone|n[úu]mero|whats', re.I),
+}
+
+
+@st.cache_data
+def default_column_indices(columns: Tuple[str, ...]) -> Dict[str, int]:
+    """
+    Índice padrão de cada selectbox de mapeamento, cacheado por tupla de
+    colunas: evita varrer os nomes de coluna a cada rerun de widget.
+    """
+    indices = {}
+    column_list = list(columns)
+    for key, hint in _FIELDS_TO_MAP.items():
+        default_selection = find_initial_column(column_list, hint, _FIELD_PATTERNS.get(key))
+        indices[key] = column_list.index(default_selection) if default_selection else 0
+    return indices
+
+
+# Ordem de exibição das colunas-chave do relatório de falhas do PATH A
+_FAILED_COLUMNS_ORDER = [
+    "Índice_Linha_Original",
+    "Nome do Responsável",
+    "Nome do Aluno",
+    "Nome da Turma",
+    "Telefone",
+    "Motivo_da_Falha",
+    "Explicação_Manual",
+]
+
+
+@st.cache_data
+def failed_report_layout(columns: Tuple[str, ...]) -> Tuple[list, Dict[str, Any]]:
+    """
+    Ordem e column_config do relatório de falhas, cacheados por tupla de
+    colunas: o dicionário de configuração só é reconstruído quando o formato
+    do relatório muda, não a cada rerun/clique.
+    """
+    failed_columns_config = {
+        "Índice_Linha_Original": st.column_config.NumberColumn("Linha"),
+        "Nome do Responsável": st.column_config.TextColumn("Responsável"),
+        "Nome do Aluno": st.column_config.TextColumn("Aluno"),
+        "Nome da Turma": st.column_config.TextColumn("Turma"),
+        "Telefone": st.column_config.TextColumn("Telefone"),
+        # Configurações para estender o texto
+        "Motivo_da_Falha": st.column_config.Column(
+            "Motivo da Falha",
+            width="large",
+            help="Por que o número falhou na padronização.",
+        ),
+        "Explicação_Manual": st.column_config.Column(
+            "Explicação_Manual",
+            width="large",
+            help="Diagnóstico manual para o formato incorreto."
+        ),
+    }
+
+    # Garante que apenas colunas existentes sejam usadas (membresia via set,
+    # preservando a ordem de exibição)
+    available = set(columns)
+    existing_cols = [col for col in _FAILED_COLUMNS_ORDER if col in available]
+    config_to_use = {k: v for k, v in failed_columns_config.items() if k in available}
+    return existing_cols, config_to_use
+
+
+@st.cache_data(show_spinner="Lendo arquivo...")
+def load_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
+    """
+    Carrega o arquivo enviado (CSV ou Excel) em um DataFrame.
+
+    Cacheado com st.cache_data (chaveado pelos bytes do arquivo): o Streamlit
+    reexecuta o script inteiro a cada interação de widget, e sem o cache cada
+    tecla digitada nos campos da API disparava um novo parse completo da planilha.
+    """
+    if filename.endswith('.csv'):
+        # Detecta o delimitador uma única vez nos primeiros 64KB e usa o
+        # parser em C do pandas (sep=None forçava o engine python, bem mais lento)
+        sample = file_bytes[:65536].decode('utf-8', errors='replace')
+        try:
+            sep = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+        except csv.Error:
+            sep = ','
+        if _HAS_POLARS:
+            # Leitura multithread em Rust; converte para pandas só no final,
+            # pois o restante do app fala pandas/Streamlit
+            df = pl.read_csv(file_bytes, separator=sep).to_pandas()
+        else:
+            df = pd.read_csv(BytesIO(file_bytes), encoding='utf-8', sep=sep)
+    else:
+        # Prefere o engine calamine (Rust, sem objetos Cell por célula);
+        # cai para openpyxl quando python-calamine não está instalado.
+        # Usa BytesIO para garantir a compatibilidade com Streamlit e pandas
+        try:
+            df = pd.read_excel(BytesIO(file_bytes), engine='calamine')
+        except ImportError:
+            df = pd.read_excel(BytesIO(file_bytes), engine='openpyxl')
+
+    # Normaliza os nomes das colunas (remove espaços em branco)
+    # Isso garante que a exibição e a seleção sejam limpas, mas as chaves do DataFrame permanecem as originais.
+    df.columns = df.columns.str.strip()
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def validate_phone_column(phone_values: pd.Series, default_country_code: str) -> Tuple[pd.Series, pd.Series]:
+    """
+    Valida a coluna de telefones uma única vez por (coluna, código padrão).
+
+    Os dois caminhos (VCF e API) consomem o mesmo par (padronizado, motivo):
+    antes, cada caminho revalidava a coluna inteira por conta própria, e o
+    cache evita repetir a passada a cada rerun de widget do Streamlit.
+    """
+    return clean_phone_series(phone_values, default_country_code)
+
+
+def main():
+    # Remove a interface do chat AI
+    
+    st.set_page_config(
+        page_title="Excel-to-WhatsApp Sender",
+        layout="wide",
+        initial_sidebar_state="collapsed" 
+    )
+    
+    st.title("🚀 Conversor Excel/CSV para Contatos/WhatsApp (Mapeamento Manual)")
+    st.markdown("Automatize a integração de contatos da sua planilha para o celular (VCF) ou para o WhatsApp Business Cloud API.")
+    st.markdown("---")
+
+    # --- Step 1: Upload & Map ---
+    
+    st.header("1. Upload e Mapeamento de Dados")
+    
+    uploaded_file = st.file_uploader("Selecione seu arquivo (.xlsx, .xls ou .csv)", type=["xlsx", "xls", "csv"])
+
+    if uploaded_file is not None:
+        try:
+            # Carrega o DataFrame (cacheado pelos bytes do arquivo: reruns do
+            # Streamlit não pagam um novo parse da planilha)
+            df = load_dataframe(uploaded_file.getvalue(), uploaded_file.name)
+
+            st.session_state['df'] = df
+            columns = df.columns.tolist()
+            
+            if not columns:
+                st.error("❌ O arquivo parece estar vazio ou sem cabeçalhos.")
+                return
+
+            st.success(f"Arquivo '{uploaded_file.name}' carregado com sucesso. {len(df)} linhas encontradas.")
+            
+            # --- NOVO: Seleção Manual de Colunas ---
+            st.subheader("Selecione as Colunas Correspondentes:")
+
+            # Cria a lista de opções, adicionando uma opção vazia se a lista não estiver vazia
+            column_options = columns
+
+            mapped_cols = {}
+            cols = st.columns(2)
+
+            # Índices sugeridos calculados uma vez por conjunto de colunas (cacheado)
+            default_indices = default_column_indices(tuple(columns))
+
+            # Cria os selectboxes
+            for i, (key, hint) in enumerate(_FIELDS_TO_MAP.items()):
+                default_index = default_indices[key]
+
+                with cols[i % 2]:
+                    # st.selectbox para seleção manual
+                    mapped_cols[key] = st.selectbox(
+                        f"Campo: **{hint}**",
+                        options=column_options,
+                        index=default_index,
+                        key=f'col_select_{key}',
+                        help=f"Selecione a coluna da sua planilha que representa o campo '{hint}'."
+                    )
+
+            # Armazenamento das colunas escolhidas
+            responsible_name_col = mapped_cols['responsible_name_col']
+            student_name_col = mapped_cols['student_name_col']
+            phone_col = mapped_cols['phone_col']
+            turma_name_col = mapped_cols['turma_name_col']
+            
+            # Validação: Garante que o usuário selecionou colunas válidas
+            if not all([responsible_name_col, student_name_col, phone_col, turma_name_col]):
+                st.warning("⚠️ Por favor, selecione uma coluna válida para cada campo.")
+                return
+
+            st.success("✅ Mapeamento de colunas concluído com sucesso!")
+
+            # =========================================================================
+            # Armazenamento e Exibição das Colunas
+            # =========================================================================
+            
+            st.subheader("Colunas Selecionadas:")
+            col_info1, col_info2 = st.columns(2)
+            with col_info1:
+                st.markdown(f"**Responsável:** `{responsible_name_col}`")
+                st.markdown(f"**Aluno:** `{student_name_col}`")
+            with col_info2:
+                st.markdown(f"**Turma:** `{turma_name_col}`")
+                st.markdown(f"**Telefone:** `{phone_col}`")
+
+            
+            # Armazenamento das colunas na session_state
+            st.session_state['responsible_name_col'] = responsible_name_col
+            st.session_state['student_name_col'] = student_name_col
+            st.session_state['phone_col'] = phone_col
+            st.session_state['turma_name_col'] = turma_name_col 
+            # =========================================================================
+            
+            # Coluna para DDD/CC (mantida como input para flexibilidade do usuário)
+            cc_col, ddd_col = st.columns([1, 2])
+            with ddd_col:
+                default_cc_ddd = st.text_input(
+                    "Código de País e DDD Padrão (Ex: 5531):", 
+                    value="5531",
+                    help="Código de País (Ex: 55) + DDD (Ex: 31). Essencial para padronizar números locais."
+                )
+            
+            # Limpa e armazena apenas quando o valor digitado mudou, em vez de
+            # renormalizar a cada rerun de widget
+            if st.session_state.get('_raw_cc_ddd') != default_cc_ddd:
+                st.session_state['_raw_cc_ddd'] = default_cc_ddd
+                st.session_state['default_cc'] = _NON_DIGIT_RE.sub('', default_cc_ddd)
+
+            # Validação única dos telefones, compartilhada pelos dois caminhos
+            # (VCF e API). Cacheada: só recomputa quando a coluna mapeada ou o
+            # código padrão mudam, não a cada rerun.
+            cleaned_series, reason_series = validate_phone_column(
+                df[phone_col], st.session_state['default_cc']
+            )
+
+            st.markdown("---")
+
+            # --- Step 2: Choose Path & Execute ---
+            st.header("2. Escolha o Caminho de Integração")
+            path = st.radio(
+                "Selecione sua necessidade:",
+                ('PATH A: Geração de VCF (Agenda Pessoal)', 'PATH B: Integração WhatsApp Cloud API (Empresarial)'),
+                index=0, key='path_select'
+            )
+
+            if path == 'PATH A: Geração de VCF (Agenda Pessoal)':
+                # --- PATH A: VCF EXECUTION ---
+                st.subheader("Geração de VCF (vCard)")
+                st.markdown("Gera um único arquivo `.vcf` pronto para importação em qualquer agenda de contatos (Google/iOS).")
+                
+                if st.button("📥 Gerar e Baixar Arquivo VCF", key="btn_vcf_gen"):
+                    
+                    # Listas para armazenar os contatos (Módulo 26)
+                    failed_contacts = []
+                    successful_contacts = [] 
+                    
+                    with st.spinner('Processando e limpando dados para VCF...'):
+                        vcf_bytes = generate_vcf_bytes(
+                            df, 
+                            st.session_state['responsible_name_col'], 
+                            st.session_state['student_name_col'],     
+                            st.session_state['phone_col'], 
+                            st.session_state['turma_name_col'],
+                            cleaned_series,
+                            reason_series,
+                            failed_contacts,
+                            successful_contacts 
+                        )
+                    
+                    # Total de blocos VCF gerados: a lista de sucessos já tem a
+                    # contagem, sem precisar varrer o payload inteiro
+                    valid_count = len(successful_contacts)
+                    
+                    # Resposta para o usuário
+                    if valid_count > 0:
+                        st.download_button(
+                            label="✅ Clique para Baixar o VCF",
+                            data=vcf_bytes,
+                            file_name=f"contatos_import_{int(time.time())}.vcf",
+                            mime="text/vcard"
+                        )
+                        st.success(f"VCF gerado com sucesso! Total de **{valid_count}** contatos válidos.")
+                    else:
+                        st.error("Nenhum contato válido foi encontrado após a limpeza dos números. Verifique o Código de País e DDD.")
+
+                    # --- NOVO REQUISITO: Relatório de Falhas e Sucessos ---
+                    st.markdown("---")
+                    # Módulo 26: Usando o título solicitado pelo usuário
+                    st.header("3. Visualização e Validação dos Números") 
+                    
+                    # 1. VISUALIZAÇÃO DE SUCESSO
+                    if successful_contacts:
+                        st.subheader("✅ Contatos Padronizados (Incluídos no VCF)")
+                        st.info(f"Total de {len(successful_contacts)} contatos validados.")
+                        success_df = pd.DataFrame(successful_contacts)
+                        # Reordena colunas
+                        columns_order = ["Índice_Linha_Original", "Nome do Responsável", "Nome do Aluno", "Nome da Turma", "Número Original", "Número Padronizado (E.164)", "Visualização VCF"]
+                        success_df = success_df[columns_order]
+                        st.dataframe(
+                            success_df,
+                            use_container_width=True,
+                            height=300
+                        )
+                        st.markdown("---")
+                    
+                    # 2. VISUALIZAÇÃO DE FALHA
+                    if failed_contacts:
+                        st.subheader("❌ Lista de Números que Falharam (Motivo + Explicação Manual)")
+                        st.warning(f"⚠️ **{len(failed_contacts)}** contato(s) falhou(aram) na padronização e NÃO foram incluídos no VCF.")
+
+                        # Converte a lista de dicionários (só as colunas de
+                        # identificação + motivo/explicação) para DataFrame
+                        failed_df = pd.DataFrame(failed_contacts)
+
+                        # Ordem e configuração das colunas, cacheadas por formato
+                        # do relatório (ver failed_report_layout)
+                        existing_cols, config_to_use = failed_report_layout(tuple(failed_df.columns))
+                        failed_df = failed_df[existing_cols]
+
+                        st.dataframe(
+                            failed_df, 
+                            column_config=config_to_use, 
+                            use_container_width=True,
+                            height=300 
+                        )
+                        
+                    elif valid_count > 0:
+                        st.info("🎉 Todos os contatos do seu arquivo foram processados com sucesso!")
+                    
+                    st.markdown("---")
+
+
+            elif path == 'PATH B: Integração WhatsApp Cloud API (Empresarial)':
+                # --- PATH B: API CREDENTIALS ---
+                st.subheader("Configuração do WhatsApp Cloud API")
+                st.warning("⚠️ **Atenção:** Certifique-se de que seu template está APROVADO.")
+                
+                # Campos dinâmicos para credenciais
+                api_token = st.text_input("Access Token da Meta:", type="password", key='api_token_input')
+                phone_id = st.text_input("Phone Number ID (ID do Telefone no Meta):", key='phone_id_input')
+                template_name = st.text_input("Nome do Template Aprovado (Ex: 'ola_novo_cliente'):", key='template_name_input')
+                send_rate = st.number_input(
+                    "Taxa de envio (msg/s):",
+                    min_value=0.5, max_value=250.0, value=10.0, step=0.5,
+                    key='send_rate_input',
+                    help="Ajuste conforme o limite de vazão aprovado para o seu template/número."
+                )
+                merge_duplicates = st.checkbox(
+                    "Mesclar números duplicados (um envio por número)",
+                    value=True,
+                    key='merge_duplicates_input',
+                    help="Comum em listas escolares: o mesmo responsável aparece em várias linhas de alunos. Envia uma única mensagem por número e replica o resultado nas linhas correspondentes."
+                )
+
+                st.info("Atenção: A lógica assume que o primeiro placeholder do seu template é o nome do contato.")
+
+                if st.button("🚀 Iniciar Envio de Mensagens via API", key="btn_api_send"):
+                    if not all([api_token, phone_id, template_name]):
+                        st.error("Por favor, preencha todos os campos de credenciais da API.")
+                        return
+
+                    st.markdown("---")
+                    st.header("Registro de Execução da API")
+                    
+                    status_log = st.empty()
+
+                    total_rows = len(df)
+
+                    # A coluna já foi validada uma única vez após o mapeamento
+                    # (validate_phone_column): o loop de despacho só trata HTTP
+                    # e atualização da UI.
+
+                    # Materializa as colunas necessárias como arrays numpy uma
+                    # única vez: o loop itera tuplas Python puras, sem a
+                    # maquinaria por-linha do pandas.
+                    responsible_names = df[st.session_state['responsible_name_col']].fillna('').astype(str).to_numpy()
+                    student_names = df[st.session_state['student_name_col']].fillna('').astype(str).to_numpy()
+                    original_phones = df[st.session_state['phone_col']].fillna('').astype(str).to_numpy()
+                    cleaned_phones = cleaned_series.to_numpy()
+                    failure_reasons = reason_series.to_numpy()
+
+                    results_container = st.empty()
+
+                    # Relatório em layout colunar (SoA): arrays de objetos
+                    # pré-alocados escritos por índice — sem lista de dicts nem
+                    # inferência por linha na construção do DataFrame. Escrita
+                    # por índice é segura entre threads (cada envio só toca a
+                    # própria posição).
+                    status_arr = np.full(total_rows, "...", dtype=object)
+                    detail_arr = np.full(total_rows, "", dtype=object)
+
+                    def _make_results_df() -> pd.DataFrame:
+                        return pd.DataFrame({
+                            "Nome do Responsável": responsible_names,
+                            "Nome do Aluno": student_names,
+                            "Número Original": original_phones,
+                            "Status": status_arr,
+                            "Detalhe da Falha": detail_arr,
+                        })
+
+                    # Marca as falhas de validação de uma vez: o prefixo do
+                    # detalhe é concatenado sobre o subconjunto inválido em uma
+                    # passada, sem uma f-string por linha
+                    invalid_mask = pd.isnull(cleaned_phones) | (cleaned_phones == '')
+                    status_arr[invalid_mask] = "❌ Falha"
+                    detail_arr[invalid_mask] = (
+                        "Número Limpo/Formatado Inválido. Motivo: "
+                        + pd.Series(failure_reasons[invalid_mask], dtype=object).fillna("Desconhecido")
+                    ).to_numpy()
+
+                    # Monta a fila de envio só com as linhas válidas. Com a
+                    # mesclagem ligada, cada número E.164 entra na fila uma
+                    # única vez (primeira ocorrência) e o resultado é replicado
+                    # para todas as linhas que compartilham o número.
+                    to_send = []  # tuplas (posição no relatório, número E.164, nome do responsável)
+                    rows_by_number: Dict[str, list] = {}
+                    for index in np.flatnonzero(~invalid_mask):
+                        cleaned_phone = cleaned_phones[index]
+                        if merge_duplicates:
+                            rows = rows_by_number.setdefault(cleaned_phone, [])
+                            if not rows:
+                                to_send.append((index, cleaned_phone, responsible_names[index]))
+                            rows.append(index)
+                        else:
+                            to_send.append((index, cleaned_phone, responsible_names[index]))
+
+                    def _apply_api_response(row_pos: int, number: str, api_response: Dict[str, Any]):
+                        """Escreve o resultado de um envio em todas as linhas do número."""
+                        if api_response['status'] == 'Success':
+                            status = "✅ Sucesso"
+                            detail = f"ID da Mensagem: {api_response.get('id', 'N/A')}"
+                        else:
+                            status = "❌ Falha"
+                            detail = api_response['detail']
+                        # Com a mesclagem ligada, replica o resultado nas linhas
+                        # duplicadas do mesmo número; sem ela, só a própria linha
+                        for pos in rows_by_number.get(number, (row_pos,)):
+                            status_arr[pos] = status
+                            detail_arr[pos] = detail
+
+                    results_container.dataframe(_make_results_df())
+
+                    if _HAS_AIOHTTP and to_send:
+                        # Caminho assíncrono: envios concorrentes limitados por
+                        # Semaphore + limitador de taxa, em vez de N × (RTT + sleep).
+                        progress_bar = st.progress(0.0)
+
+                        def _on_progress(done: int, total: int):
+                            progress_bar.progress(done / total)
+                            status_log.write(f"Enviando mensagens... {done}/{total} concluídas.")
+
+                        api_responses = asyncio.run(_send_all_async(
+                            [(number, name) for _, number, name in to_send],
+                            phone_id,
+                            api_token,
+                            template_name,
+                            rps=send_rate,
+                            progress_cb=_on_progress,
+                        ))
+                        for (row_pos, number, _), api_response in zip(to_send, api_responses):
+                            _apply_api_response(row_pos, number, api_response)
+                        progress_bar.empty()
+
+                        results_container.dataframe(_style_failures(_make_results_df()))
+                    else:
+                        # Fallback sem aiohttp: despacha lotes em paralelo com um
+                        # ThreadPoolExecutor sobre a _SESSION com pool de
+                        # conexões; o RateLimiter compartilhado entre as threads
+                        # mantém a taxa configurada. A tabela é redesenhada por
+                        # lote concluído (e não por linha): redesenhar o
+                        # DataFrame inteiro por contato dava custo O(N²) de
+                        # renderização no navegador.
+                        progress_bar = st.progress(0.0)
+                        limiter = RateLimiter(send_rate)
+
+                        def _send_batch_worker(chunk):
+                            # Respeita a taxa configurada: um token por mensagem do lote
+                            for _ in chunk:
+                                limiter.acquire()
+                            responses = send_whatsapp_template_batch(
+                                phone_id,
+                                api_token,
+                                [(number, name) for _, number, name in chunk],
+                                template_name
+                            )
+                            return chunk, responses
+
+                        # Agrupa em lotes de até 50 contatos: N requisições HTTP
+                        # viram ceil(N/50) POSTs no endpoint batch do Graph API
+                        chunks = [
+                            to_send[i:i + _GRAPH_BATCH_SIZE]
+                            for i in range(0, len(to_send), _GRAPH_BATCH_SIZE)
+                        ]
+
+                        done = 0
+                        with ThreadPoolExecutor(max_workers=10) as executor:
+                            futures = [executor.submit(_send_batch_worker, chunk) for chunk in chunks]
+                            for future in as_completed(futures):
+                                chunk, responses = future.result()
+                                for (row_pos, number, _), api_response in zip(chunk, responses):
+                                    _apply_api_response(row_pos, number, api_response)
+
+                                done += len(chunk)
+                                progress_bar.progress(done / len(to_send))
+                                if len(chunks) > 1:
+                                    results_container.dataframe(_make_results_df())
+                        progress_bar.empty()
+
+                        # Estilização aplicada uma única vez, no render final
+                        results_container.dataframe(_style_failures(_make_results_df()))
+
+                    success_count = int((status_arr == "✅ Sucesso").sum())
+                    failure_count = int((status_arr == "❌ Falha").sum())
+
+                    # Relatório Final
+                    st.markdown("---")
+                    st.success(f"Processo Concluído! Total de Contatos: {total_rows}")
+                    st.metric(label="Mensagens Enviadas com Sucesso", value=success_count)
+                    st.metric(label="Falhas no Envio", value=failure_count)
+
+                    # Exporta o relatório completo como CSV (mesmo padrão do
+                    # download do VCF no PATH A): a tabela exibida é limitada
+                    # pelo frontend, o arquivo traz todas as linhas
+                    st.download_button(
+                        label="⬇️ Baixar Relatório Completo (CSV)",
+                        data=_make_results_df().to_csv(index=False).encode('utf-8'),
+                        file_name=f"relatorio_envio_{int(time.time())}.csv",
+                        mime="text/csv"
+                    )
+
+                    status_log.empty() # Remove o status de processamento
+
+        except Exception as e:
+            st.error(f"Ocorreu um erro no processamento do arquivo: {e}")
+            st.warning("Verifique se as colunas e o formato do arquivo estão corretos. Erro técnico: " + str(e))
+
+    else:
+        st.info("Aguardando o upload do seu arquivo Excel ou CSV.")
+
+if __name__ == '__main__':
+    main()